@@ -179,7 +179,9 @@ const Dashboard = () => {
             });
             const data = await res.json();
             if (!res.ok) throw new Error(data.error);
-            setSummary(prev => prev.filter(email => !idsToMark.includes(email.id)));
+            const failed = data.failed || [];
+            setSummary(prev => prev.filter(email => !idsToMark.includes(email.id) || failed.includes(email.id)));
+            if (failed.length) alert(`Could not mark ${failed.length} email(s) as read.`);
         } catch (err) {
             alert("Failed to mark all as read: " + err.message);
         }
@@ -162,8 +162,15 @@ def mark_all_read_action():
     
     try:
         from scripts.gmail import mark_batch_as_read
-        mark_batch_as_read(service, email_ids)
-        return jsonify({"success": True, "message": "All emails marked as read"})
+        failed = mark_batch_as_read(service, email_ids)
+        if failed:
+            # 207: some IDs were marked read, the ones listed in "failed" were not
+            return jsonify({
+                "success": False,
+                "message": f"{len(failed)} email(s) could not be marked as read",
+                "failed": list(failed)
+            }), 207
+        return jsonify({"success": True, "message": "All emails marked as read", "failed": []})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -1,11 +1,17 @@
+import argparse
+import json
+import sys
+
 from gmail import (
     authenticate_gmail,
     return_unread_emails,
     mark_emails_as_read,
+    mark_batch_as_read,
     send_email
 )
 from response import summarize_emails
 from summary_txt import save_summary_to_txt
+from batch import load_policy, run_batch
 
 log_file = "summaries.txt"
 
@@ -17,11 +23,11 @@ def main():
         print("No unread emails found.")
         return
 
-    # Build a lookup from (From, Subject) to Gmail message ID
-    email_id_map = {(email['From'], email['Subject']): email['id'] for email in filtered_messages}
+    # Gemini echoes back the message ID, so only keep IDs we actually fetched
+    fetched_ids = {email['id'] for email in filtered_messages}
 
     # Get structured summary/actions from Gemini
-    important_emails = summarize_emails(filtered_messages)
+    important_emails, _ = summarize_emails(filtered_messages)
 
     if not important_emails:
         print("No important emails found today.")
@@ -41,18 +47,18 @@ def main():
     # Ask user to mark all important emails as read
     mark_read = input("Do you want to mark all these important emails as read? (y/n): ")
     if mark_read.lower() == 'y':
-        for email in important_emails:
-            key = (email['From'], email['Subject'])
-            message_id = email_id_map.get(key)
-            if message_id:
-                mark_emails_as_read(service, message_id)
-        print("All important emails marked as read.")
+        failed = mark_batch_as_read(service, [email['id'] for email in important_emails if email['id'] in fetched_ids])
+        if failed:
+            print(f"Could not mark {len(failed)} email(s) as read:")
+            for message_id, error in failed.items():
+                print(f"  {message_id}: {error}")
+        else:
+            print("All important emails marked as read.")
 
     # Handle replies separately
     for email in important_emails:
         if email['RecommendedAction'] == "reply":
-            key = (email['From'], email['Subject'])
-            message_id = email_id_map.get(key)
+            message_id = email['id'] if email['id'] in fetched_ids else None
             print(f"\nReply suggested for email from {email['From']} | Subject: {email['Subject']}")
             suggested_reply = email.get("ReplyContent", "")
             print("AI draft:\n", suggested_reply)
@@ -69,5 +75,39 @@ def main():
             if mark_read.lower() != 'y' and message_id:
                 mark_emails_as_read(service, message_id)
 
+def batch_main(args):
+    policy = load_policy(args.policy)
+    report = run_batch(args.token_files, policy, dry_run=args.dry_run, log_file=log_file)
+
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    # Non-zero exit so cron can flag failures: 1 if an account could not be
+    # processed, 2 if only individual actions failed (see "failed" in the report)
+    if any(account["error"] for account in report["accounts"]):
+        return 1
+    if any(account["failed"] for account in report["accounts"]):
+        return 2
+    return 0
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Summarize unread Gmail and act on the results.",
+        epilog="Batch mode exits 1 if an account failed and 2 if only individual actions failed."
+    )
+    parser.add_argument("--batch", action="store_true", help="Run non-interactively over one or more token files")
+    parser.add_argument("--token-files", nargs="+", default=["token.json"], help="Token files to process in batch mode")
+    parser.add_argument("--policy", help="JSON file deciding which actions to auto-apply (default: none)")
+    parser.add_argument("--dry-run", action="store_true", help="Print planned actions without changing any mailbox")
+    parser.add_argument("--report", help="Path for the JSON run report (required with --batch)")
+    args = parser.parse_args(argv)
+    # stdout also carries progress messages, so the report always goes to a file
+    if args.batch and not args.report:
+        parser.error("--report is required with --batch")
+    return args
+
 if __name__ == "__main__":
+    args = parse_args()
+    if args.batch:
+        sys.exit(batch_main(args))
     main()
@@ -0,0 +1,225 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from gmail import (
+    load_credentials,
+    build_service,
+    return_unread_emails,
+    mark_emails_as_read,
+    mark_batch_as_read,
+    trash_batch,
+    send_email
+)
+from response import summarize_emails
+from summary_txt import save_summary_to_txt
+
+# Nothing is applied unless the policy file opts in
+DEFAULT_POLICY = {
+    "mark_as_read": False,
+    "trash": False,
+    "reply": False,
+    "max_reply_workers": 4
+}
+ACTION_KEYS = ("mark_as_read", "trash", "reply")
+
+def load_policy(path=None):
+    """
+    Load the auto-apply policy from a JSON file, e.g.
+    {"mark_as_read": true, "trash": true, "reply": false, "max_reply_workers": 8}
+    Missing keys fall back to DEFAULT_POLICY. Unknown keys and values of the
+    wrong type are rejected, so a typo can never switch an action on.
+    """
+    policy = dict(DEFAULT_POLICY)
+    if not path:
+        return policy
+    with open(path, "r", encoding="utf-8") as f:
+        overrides = json.load(f)
+    if not isinstance(overrides, dict):
+        raise ValueError(f"Policy file {path} must contain a JSON object")
+    unknown = set(overrides) - set(DEFAULT_POLICY)
+    if unknown:
+        raise ValueError(f"Unknown policy keys in {path}: {', '.join(sorted(unknown))}")
+    for key in ACTION_KEYS:
+        if key in overrides and not isinstance(overrides[key], bool):
+            raise ValueError(f"Policy key {key} in {path} must be true or false")
+    workers = overrides.get("max_reply_workers", DEFAULT_POLICY["max_reply_workers"])
+    if isinstance(workers, bool) or not isinstance(workers, int) or workers < 1:
+        raise ValueError(f"Policy key max_reply_workers in {path} must be a positive integer")
+    policy.update(overrides)
+    return policy
+
+def match_actions(messages, actions):
+    """
+    Pair each Gemini action with the fetched message that has the same ID.
+    Actions with an unknown or repeated ID are returned separately.
+    """
+    messages_by_id = {message['id']: message for message in messages}
+    matched = []
+    unmatched_ids = []
+    seen = set()
+    for action in actions:
+        message_id = action.get('id')
+        message = messages_by_id.get(message_id)
+        if message is None or message_id in seen:
+            unmatched_ids.append(message_id)
+            continue
+        seen.add(message_id)
+        matched.append((message, action))
+    return matched, unmatched_ids
+
+def plan_actions(matched, policy):
+    plan = {"mark_as_read": [], "trash": [], "reply": []}
+    for message, action in matched:
+        kind = action.get("RecommendedAction")
+        if kind not in plan or not policy.get(kind):
+            continue
+        if kind == "reply":
+            if not action.get("ReplyContent"):
+                continue
+            # Address the reply from the fetched headers, not the model output
+            plan["reply"].append({
+                "id": message['id'],
+                "to": message['From'],
+                "subject": f"Re: {message.get('Subject') or ''}",
+                "body": action["ReplyContent"]
+            })
+        else:
+            plan[kind].append(message['id'])
+    return plan
+
+def send_replies(creds, replies, max_workers):
+    """
+    Send replies with at most max_workers requests in flight.
+    Each message is marked as read right after its reply is sent, so a
+    later failure cannot make the next run reply to it again.
+    Returns the sent message IDs, the IDs also marked read, and a dict of failures.
+    """
+    # Gmail service objects share one HTTP connection that is not
+    # thread-safe, so every worker thread builds its own.
+    local = threading.local()
+
+    def send(reply):
+        if not hasattr(local, "service"):
+            local.service = build_service(creds)
+        send_email(local.service, reply["to"], reply["subject"], reply["body"])
+        try:
+            mark_emails_as_read(local.service, reply["id"])
+        except Exception as e:
+            return f"Reply sent but not marked read: {e}"
+        return None
+
+    sent = []
+    marked = []
+    failed = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(send, reply): reply["id"] for reply in replies}
+        for future in as_completed(futures):
+            message_id = futures[future]
+            try:
+                mark_error = future.result()
+            except Exception as e:
+                failed[message_id] = str(e)
+                continue
+            sent.append(message_id)
+            if mark_error:
+                failed[message_id] = mark_error
+            else:
+                marked.append(message_id)
+    return sent, marked, failed
+
+@contextmanager
+def timed(timings, name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = round(time.perf_counter() - start, 3)
+
+def print_plan(token_file, plan, messages_by_id):
+    print(f"\n[dry-run] {token_file}")
+    for kind in ("mark_as_read", "trash"):
+        for message_id in plan[kind]:
+            message = messages_by_id[message_id]
+            print(f"  would {kind}: {message_id} | {message['From']} | {message['Subject']}")
+    for reply in plan["reply"]:
+        print(f"  would reply: {reply['id']} | to {reply['to']} | {reply['subject']}")
+
+def process_account(token_file, policy, dry_run=False, log_file="summaries.txt"):
+    report = {
+        "token_file": token_file,
+        "fetched": 0,
+        "matched": 0,
+        "unmatched_ids": [],
+        "planned": {},
+        "applied": {"mark_as_read": 0, "trash": 0, "reply": 0, "reply_marked_read": 0},
+        "failed": {},
+        "global_summary": None,
+        "error": None,
+        "timings": {}
+    }
+    timings = report["timings"]
+
+    try:
+        with timed(timings, "total"):
+            with timed(timings, "auth"):
+                creds = load_credentials(token_file, interactive=False)
+                service = build_service(creds)
+
+            with timed(timings, "fetch"):
+                messages = return_unread_emails(service)
+            report["fetched"] = len(messages)
+            if not messages:
+                return report
+
+            with timed(timings, "summarize"):
+                actions, report["global_summary"] = summarize_emails(messages)
+
+            matched, report["unmatched_ids"] = match_actions(messages, actions)
+            report["matched"] = len(matched)
+            plan = plan_actions(matched, policy)
+            report["planned"] = {kind: len(ids) for kind, ids in plan.items()}
+
+            if dry_run:
+                print_plan(token_file, plan, {m['id']: m for m in messages})
+                return report
+
+            save_summary_to_txt([action for _, action in matched], filename=log_file, account=token_file)
+
+            if plan["trash"]:
+                with timed(timings, "trash"):
+                    failed = trash_batch(service, plan["trash"])
+                report["applied"]["trash"] = len(plan["trash"]) - len(failed)
+                report["failed"].update({message_id: str(e) for message_id, e in failed.items()})
+
+            if plan["reply"]:
+                with timed(timings, "reply"):
+                    sent, marked, failed = send_replies(creds, plan["reply"], policy["max_reply_workers"])
+                report["applied"]["reply"] = len(sent)
+                report["applied"]["reply_marked_read"] = len(marked)
+                report["failed"].update(failed)
+
+            if plan["mark_as_read"]:
+                with timed(timings, "mark_as_read"):
+                    failed = mark_batch_as_read(service, plan["mark_as_read"])
+                report["applied"]["mark_as_read"] = len(plan["mark_as_read"]) - len(failed)
+                report["failed"].update({message_id: str(e) for message_id, e in failed.items()})
+    except Exception as e:
+        report["error"] = str(e)
+    return report
+
+def run_batch(token_files, policy, dry_run=False, log_file="summaries.txt"):
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "dry_run": dry_run,
+        "policy": policy,
+        "accounts": [],
+        "timings": {}
+    }
+    with timed(report["timings"], "total"):
+        for token_file in token_files:
+            report["accounts"].append(process_account(token_file, policy, dry_run, log_file))
+    return report
@@ -1,4 +1,5 @@
 import os
+import sys
 import base64
 from email import message_from_bytes
 from google.auth.transport.requests import Request
@@ -12,21 +13,30 @@ import io
 
 SCOPES = ['https://www.googleapis.com/auth/gmail.modify']
 query = "is:unread"
+HTTP_BATCH_LIMIT = 50
 
-def authenticate_gmail():
+def load_credentials(token_file='token.json', interactive=True):
     creds = None
-    if os.path.exists('token.json'):
-        creds = Credentials.from_authorized_user_file('token.json', SCOPES)
-        print("Granted scopes:", creds.scopes)
+    if os.path.exists(token_file):
+        creds = Credentials.from_authorized_user_file(token_file, SCOPES)
+        print("Granted scopes:", creds.scopes, file=sys.stderr)
     if not creds or not creds.valid:
         if creds and creds.expired and creds.refresh_token:
             creds.refresh(Request())
-        else:
+        elif interactive:
             flow = InstalledAppFlow.from_client_secrets_file('credentials.json', SCOPES)
             creds = flow.run_local_server(port=0)
-        with open('token.json', 'w') as token:
+        else:
+            raise RuntimeError(f"No valid credentials in {token_file} and interactive login is disabled")
+        with open(token_file, 'w') as token:
             token.write(creds.to_json())
-    return build('gmail', 'v1', credentials=creds)
+    return creds
+
+def build_service(creds):
+    return build('gmail', 'v1', credentials=creds, cache_discovery=False)
+
+def authenticate_gmail(token_file='token.json', interactive=True):
+    return build_service(load_credentials(token_file, interactive))
 
 def extract_attachment_text(service, message_id, part):
     attachment_id = part['body'].get('attachmentId')
@@ -108,19 +118,50 @@ def mark_emails_as_read(service, email_id):
         body={'removeLabelIds': ['UNREAD']}
     ).execute()
 
+def execute_batched(service, email_ids, make_request):
+    """
+    Run one request per message ID using batched HTTP requests.
+    Each request succeeds or fails on its own, so one bad ID does not
+    fail the rest. If a whole batch fails to send, every ID in it is
+    recorded as failed and the remaining batches still run.
+    Returns a dict mapping each failed message ID to its error.
+    """
+    failed = {}
+
+    def callback(request_id, response, exception):
+        if exception is not None:
+            failed[request_id] = exception
+
+    # Batch request IDs must be unique
+    email_ids = list(dict.fromkeys(email_ids))
+    for start in range(0, len(email_ids), HTTP_BATCH_LIMIT):
+        batch = service.new_batch_http_request(callback=callback)
+        chunk = email_ids[start:start + HTTP_BATCH_LIMIT]
+        for email_id in chunk:
+            batch.add(make_request(email_id), request_id=email_id)
+        try:
+            batch.execute()
+        except Exception as e:
+            for email_id in chunk:
+                failed.setdefault(email_id, e)
+    return failed
+
 def mark_batch_as_read(service, email_ids):
-    batch = service.new_batch_http_request()
-    for email_id in email_ids:
-        batch.add(service.users().messages().modify(
-            userId='me',
-            id=email_id,
-            body={'removeLabelIds': ['UNREAD']}
-        ))
-    batch.execute()
+    return execute_batched(service, email_ids, lambda email_id: service.users().messages().modify(
+        userId='me',
+        id=email_id,
+        body={'removeLabelIds': ['UNREAD']}
+    ))
 
 def trash_email(service, email_id):
     service.users().messages().trash(userId='me', id=email_id).execute()
 
+def trash_batch(service, email_ids):
+    # There is no bulk trash endpoint, so trash calls are batched per message
+    return execute_batched(service, email_ids, lambda email_id: service.users().messages().trash(
+        userId='me', id=email_id
+    ))
+
 def send_email(service, to, subject, body):
     from email.mime.text import MIMEText
     import base64
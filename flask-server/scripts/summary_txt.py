@@ -2,10 +2,11 @@ import os
 from datetime import datetime
 import pytz  # pip install pytz
 
-def save_summary_to_txt(actions, filename="summaries.txt", tz="America/Toronto"):
+def save_summary_to_txt(actions, filename="summaries.txt", tz="America/Toronto", account=None):
     """
     Append a timestamped summary to a text log file.
     Accepts a list of email actions from Gemini.
+    If account is given, the entry is labelled with it.
     Prevents appending duplicates in a row.
     """
     now = datetime.now(pytz.timezone(tz)).strftime("%Y-%m-%d %H:%M:%S %Z")
@@ -24,6 +25,8 @@ def save_summary_to_txt(actions, filename="summaries.txt", tz="America/Toronto")
         summary_lines.append(line)
 
     summary_text = "\n".join(summary_lines)
+    if account:
+        summary_text = f"Account: {account}\n{summary_text}"
 
     # Prepare log entry
     entry = (
@@ -0,0 +1,244 @@
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+import batch
+import gmail
+
+
+def write_policy(tmp_path, policy):
+    path = tmp_path / "policy.json"
+    path.write_text(json.dumps(policy), encoding="utf-8")
+    return str(path)
+
+
+def message(message_id, sender="sender@example.com", subject="Hello"):
+    return {"id": message_id, "From": sender, "Subject": subject}
+
+
+class FakeBatch:
+    def __init__(self, callback, bad_ids, batches, broken_batches=()):
+        self.callback = callback
+        self.bad_ids = bad_ids
+        self.broken = len(batches) in broken_batches
+        self.request_ids = []
+        batches.append(self)
+
+    def add(self, request, request_id):
+        assert request_id not in self.request_ids
+        self.request_ids.append(request_id)
+
+    def execute(self):
+        if self.broken:
+            raise Exception("connection reset")
+        for request_id in self.request_ids:
+            error = Exception(f"bad id {request_id}") if request_id in self.bad_ids else None
+            self.callback(request_id, None, error)
+
+
+def fake_service(bad_ids=(), broken_batches=()):
+    batches = []
+    service = MagicMock()
+    service.new_batch_http_request.side_effect = lambda callback: FakeBatch(
+        callback, set(bad_ids), batches, broken_batches
+    )
+    return service, batches
+
+
+def test_load_policy_defaults_apply_nothing():
+    policy = batch.load_policy()
+    assert not any(policy[key] for key in batch.ACTION_KEYS)
+
+
+def test_load_policy_merges_overrides(tmp_path):
+    policy = batch.load_policy(write_policy(tmp_path, {"trash": True, "max_reply_workers": 8}))
+    assert policy["trash"] is True
+    assert policy["reply"] is False
+    assert policy["max_reply_workers"] == 8
+
+
+@pytest.mark.parametrize("overrides", [
+    {"auto_reply": True},
+    {"reply": "false"},
+    {"trash": 1},
+    {"max_reply_workers": "4"},
+    {"max_reply_workers": True},
+    {"max_reply_workers": 0},
+])
+def test_load_policy_rejects_bad_keys_and_values(tmp_path, overrides):
+    with pytest.raises(ValueError):
+        batch.load_policy(write_policy(tmp_path, overrides))
+
+
+def test_load_policy_rejects_non_object(tmp_path):
+    with pytest.raises(ValueError):
+        batch.load_policy(write_policy(tmp_path, ["reply"]))
+
+
+def test_match_actions_drops_unknown_and_duplicate_ids():
+    messages = [message("a"), message("b")]
+    actions = [
+        {"id": "a", "RecommendedAction": "trash"},
+        {"id": "z", "RecommendedAction": "trash"},
+        {"id": "a", "RecommendedAction": "reply"},
+        {"id": None, "RecommendedAction": "trash"},
+        {"id": "b", "RecommendedAction": "mark_as_read"},
+    ]
+    matched, unmatched_ids = batch.match_actions(messages, actions)
+    assert [(m["id"], a["RecommendedAction"]) for m, a in matched] == [("a", "trash"), ("b", "mark_as_read")]
+    assert unmatched_ids == ["z", "a", None]
+
+
+def test_match_actions_keeps_messages_with_same_sender_and_subject_apart():
+    messages = [message("a"), message("b")]
+    actions = [{"id": "b", "RecommendedAction": "trash"}, {"id": "a", "RecommendedAction": "reply"}]
+    matched, _ = batch.match_actions(messages, actions)
+    assert [(m["id"], a["id"]) for m, a in matched] == [("b", "b"), ("a", "a")]
+
+
+def test_plan_actions_follows_policy():
+    matched = [
+        (message("a"), {"RecommendedAction": "trash"}),
+        (message("b"), {"RecommendedAction": "mark_as_read"}),
+        (message("c"), {"RecommendedAction": "reply", "ReplyContent": "Thanks"}),
+    ]
+    policy = dict(batch.DEFAULT_POLICY, trash=True)
+    plan = batch.plan_actions(matched, policy)
+    assert plan == {"mark_as_read": [], "trash": ["a"], "reply": []}
+
+
+def test_plan_actions_skips_reply_without_content():
+    matched = [
+        (message("a"), {"RecommendedAction": "reply", "ReplyContent": ""}),
+        (message("b"), {"RecommendedAction": "reply"}),
+    ]
+    plan = batch.plan_actions(matched, dict(batch.DEFAULT_POLICY, reply=True))
+    assert plan["reply"] == []
+
+
+def test_plan_actions_addresses_reply_from_fetched_headers():
+    matched = [(
+        message("a", sender="real@example.com", subject=None),
+        {"From": "spoofed@example.com", "RecommendedAction": "reply", "ReplyContent": "Thanks"},
+    )]
+    plan = batch.plan_actions(matched, dict(batch.DEFAULT_POLICY, reply=True))
+    assert plan["reply"] == [{"id": "a", "to": "real@example.com", "subject": "Re: ", "body": "Thanks"}]
+
+
+def test_trash_batch_collects_per_message_failures():
+    service, batches = fake_service(bad_ids={"b"})
+    ids = [f"m{i}" for i in range(gmail.HTTP_BATCH_LIMIT)] + ["b"]
+    failed = gmail.trash_batch(service, ids)
+    assert list(failed) == ["b"]
+    assert [len(b.request_ids) for b in batches] == [gmail.HTTP_BATCH_LIMIT, 1]
+
+
+def test_execute_batched_records_failed_chunk_and_continues():
+    service, batches = fake_service(bad_ids={"m0"}, broken_batches={1})
+    ids = [f"m{i}" for i in range(gmail.HTTP_BATCH_LIMIT * 2 + 1)]
+    failed = gmail.trash_batch(service, ids)
+    assert len(batches) == 3
+    assert set(failed) == {"m0"} | set(ids[gmail.HTTP_BATCH_LIMIT:gmail.HTTP_BATCH_LIMIT * 2])
+    assert "connection reset" in str(failed[ids[gmail.HTTP_BATCH_LIMIT]])
+
+
+def test_mark_batch_as_read_ignores_duplicate_ids():
+    service, batches = fake_service(bad_ids={"bad"})
+    failed = gmail.mark_batch_as_read(service, ["a", "bad", "a"])
+    assert list(failed) == ["bad"]
+    assert batches[0].request_ids == ["a", "bad"]
+
+
+def test_send_replies_marks_each_reply_read(monkeypatch):
+    sent_to = []
+    marked = []
+
+    def send_email(service, to, subject, body):
+        if to == "fail@example.com":
+            raise Exception("send failed")
+        sent_to.append(to)
+
+    def mark_emails_as_read(service, email_id):
+        if email_id == "c":
+            raise Exception("modify failed")
+        marked.append(email_id)
+
+    monkeypatch.setattr(batch, "build_service", lambda creds: object())
+    monkeypatch.setattr(batch, "send_email", send_email)
+    monkeypatch.setattr(batch, "mark_emails_as_read", mark_emails_as_read)
+
+    replies = [
+        {"id": "a", "to": "ok@example.com", "subject": "Re: x", "body": "hi"},
+        {"id": "b", "to": "fail@example.com", "subject": "Re: y", "body": "hi"},
+        {"id": "c", "to": "ok@example.com", "subject": "Re: z", "body": "hi"},
+    ]
+    sent, marked_ids, failed = batch.send_replies(None, replies, max_workers=2)
+    assert sorted(sent) == ["a", "c"]
+    assert marked_ids == ["a"] and marked == ["a"]
+    assert set(failed) == {"b", "c"}
+    assert "not marked read" in failed["c"]
+
+
+def test_process_account_marks_replies_read_before_later_failures(monkeypatch, tmp_path):
+    messages = [message("a"), message("b")]
+    actions = [
+        {"id": "a", "RecommendedAction": "reply", "ReplyContent": "Thanks"},
+        {"id": "b", "RecommendedAction": "mark_as_read"},
+    ]
+    marked = []
+    logged = {}
+
+    def mark_batch_as_read(service, email_ids):
+        raise Exception("network down")
+
+    monkeypatch.setattr(batch, "load_credentials", lambda token_file, interactive: None)
+    monkeypatch.setattr(batch, "build_service", lambda creds: object())
+    monkeypatch.setattr(batch, "return_unread_emails", lambda service: messages)
+    monkeypatch.setattr(batch, "summarize_emails", lambda emails: (actions, "Briefing"))
+    monkeypatch.setattr(batch, "save_summary_to_txt", lambda actions, filename, account: logged.update(account=account))
+    monkeypatch.setattr(batch, "send_email", lambda service, to, subject, body: None)
+    monkeypatch.setattr(batch, "mark_emails_as_read", lambda service, email_id: marked.append(email_id))
+    monkeypatch.setattr(batch, "mark_batch_as_read", mark_batch_as_read)
+
+    policy = dict(batch.DEFAULT_POLICY, reply=True, mark_as_read=True)
+    report = batch.process_account("alice.json", policy, log_file=str(tmp_path / "log.txt"))
+
+    assert marked == ["a"]
+    assert report["applied"] == {"mark_as_read": 0, "trash": 0, "reply": 1, "reply_marked_read": 1}
+    assert report["planned"] == {"mark_as_read": 1, "trash": 0, "reply": 1}
+    assert report["error"] == "network down"
+    assert logged["account"] == "alice.json"
+
+
+def test_process_account_counts_partially_applied_trash(monkeypatch, tmp_path):
+    ids = [f"m{i}" for i in range(gmail.HTTP_BATCH_LIMIT + 5)]
+    service, _ = fake_service(broken_batches={1})
+    monkeypatch.setattr(batch, "load_credentials", lambda token_file, interactive: None)
+    monkeypatch.setattr(batch, "build_service", lambda creds: service)
+    monkeypatch.setattr(batch, "return_unread_emails", lambda service: [message(i) for i in ids])
+    monkeypatch.setattr(batch, "summarize_emails", lambda emails: (
+        [{"id": i, "RecommendedAction": "trash"} for i in ids], "Briefing"
+    ))
+    monkeypatch.setattr(batch, "save_summary_to_txt", lambda actions, filename, account: None)
+
+    policy = dict(batch.DEFAULT_POLICY, trash=True)
+    report = batch.process_account("alice.json", policy, log_file=str(tmp_path / "log.txt"))
+
+    assert report["error"] is None
+    assert report["applied"]["trash"] == gmail.HTTP_BATCH_LIMIT
+    assert len(report["failed"]) == 5
+
+
+@pytest.mark.parametrize("accounts, code", [
+    ([{"error": None, "failed": {}}], 0),
+    ([{"error": None, "failed": {}}, {"error": None, "failed": {"a": "bad id"}}], 2),
+    ([{"error": "no token", "failed": {}}, {"error": None, "failed": {"a": "bad id"}}], 1),
+])
+def test_batch_main_exit_code(monkeypatch, tmp_path, accounts, code):
+    import app
+
+    monkeypatch.setattr(app, "run_batch", lambda *args, **kwargs: {"accounts": accounts})
+    args = app.parse_args(["--batch", "--report", str(tmp_path / "report.json")])
+    assert app.batch_main(args) == code
+    assert json.loads((tmp_path / "report.json").read_text())["accounts"] == accounts